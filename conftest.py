@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def creds_dir(tmp_path_factory: pytest.TempPathFactory):
+    """Directory for test credentials.json files, created once per test session."""
+    return tmp_path_factory.mktemp("creds")
@@ -15,12 +15,12 @@ CREDENTIALS_FILE = os.path.join(creds_dir, "credentials.json")
 
 
 def main():
-    if not os.path.exists(CREDENTIALS_FILE):
+    try:
+        creds = Credentials.from_authorized_user_file(CREDENTIALS_FILE)
+    except FileNotFoundError:
         print(f"Error: {CREDENTIALS_FILE} not found")
         return
 
-    creds = Credentials.from_authorized_user_file(CREDENTIALS_FILE)
-
     # Print token expiry
     print(f"Token Expiry: {creds.expiry}")
 
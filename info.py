@@ -4,71 +4,59 @@
 import sys
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from server import get_session, get_credentials_path
-
 def get_user_info(access_token: str) -> dict:
     """Get user info from Google."""
-    import requests
-    response = requests.get(
+    from server import HTTP_CLIENT, json_loads
+    response = HTTP_CLIENT.get(
         "https://www.googleapis.com/oauth2/v1/userinfo?alt=json",
         headers={"Authorization": f"Bearer {access_token}"}
     )
-    if response.ok:
-        return response.json()
+    if response.is_success:
+        return json_loads(response.content)
     return {}
 
 def get_project_info(access_token: str) -> dict:
     """Get project and tier info from loadCodeAssist."""
-    import requests
-    url = "https://cloudcode-pa.googleapis.com/v1internal:loadCodeAssist"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "User-Agent": "google-api-nodejs-client/9.15.1",
-        "X-Goog-Api-Client": "gl-node/22.17.0",
-        "Client-Metadata": "ideType=IDE_UNSPECIFIED,platform=PLATFORM_UNSPECIFIED,pluginType=GEMINI",
-    }
-    payload = {
-        "metadata": {
-            "ideType": "IDE_UNSPECIFIED",
-            "platform": "PLATFORM_UNSPECIFIED",
-            "pluginType": "GEMINI",
-        }
-    }
-    response = requests.post(url, headers=headers, json=payload)
-    if response.ok:
-        return response.json()
+    from server import CODE_ASSIST_METADATA_BODY, ENDPOINT, HTTP_CLIENT, json_loads
+    url = f"{ENDPOINT}:loadCodeAssist"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = HTTP_CLIENT.post(url, headers=headers, content=CODE_ASSIST_METADATA_BODY)
+    if response.is_success:
+        return json_loads(response.content)
     return {"error": response.text}
 
 def main():
+    """Print credential, user and project info.
+
+    Loading goes through server's process-wide credentials cache, so when
+    main.py calls this before starting the server, the first MCP call reuses
+    the session instead of reading credentials.json again.
+    """
     print("=" * 60)
     print("Gemini Credentials Info")
     print("=" * 60)
     print()
+
+    from server import credentials_expiry_utc, get_session_with_data
     
     # Get access token
     try:
-        access_token = get_session()
+        access_token, creds_data = get_session_with_data()
         print("✓ Credentials loaded successfully")
-        creds_path = get_credentials_path()
         try:
-            with open(creds_path, "r") as f:
-                creds_data = json.load(f)
-            expiry_raw = creds_data.get("expiry")
-            if isinstance(expiry_raw, str) and expiry_raw:
-                expiry = datetime.fromisoformat(expiry_raw.replace("Z", "+00:00"))
-                if expiry.tzinfo is None:
-                    expiry = expiry.replace(tzinfo=timezone.utc)
+            expiry = credentials_expiry_utc(creds_data)
+            if expiry is not None:
                 remaining = (expiry - datetime.now(timezone.utc)).total_seconds()
                 if remaining >= 0:
-                    print(f"  Token expires at: {expiry.astimezone(timezone.utc).isoformat()}")
+                    print(f"  Token expires at: {expiry.isoformat()}")
                     print(f"  Token TTL (approx): {int(remaining)}s")
                 else:
-                    print(f"  Token expiry: {expiry.astimezone(timezone.utc).isoformat()} (expired)")
+                    print(f"  Token expiry: {expiry.isoformat()} (expired)")
         except Exception:
             # Best-effort: info still works without these fields
             pass
@@ -77,10 +65,16 @@ def main():
         print(f"✗ Failed to load credentials: {e}")
         sys.exit(1)
     
+    # Fetch user and project info concurrently over the shared connection pool
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        user_future = pool.submit(get_user_info, access_token)
+        project_future = pool.submit(get_project_info, access_token)
+        user_info = user_future.result()
+        project_info = project_future.result()
+
     # Get user info
     print("## User Info")
     print("-" * 40)
-    user_info = get_user_info(access_token)
     if user_info:
         print(f"  Email: {user_info.get('email', 'N/A')}")
         print(f"  Name: {user_info.get('name', 'N/A')}")
@@ -92,7 +86,6 @@ def main():
     # Get project info
     print("## Project & Tier Info")
     print("-" * 40)
-    project_info = get_project_info(access_token)
     
     if "error" in project_info:
         print(f"  Error: {project_info['error']}")
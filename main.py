@@ -44,6 +44,9 @@ def main() -> None:
         raise ValueError(f"CREDENTIALS_PATH must be a directory, not a file path: {creds_dir}")
     credentials_path = os.path.join(creds_dir, "credentials.json")
     ensure_credentials(credentials_path)
+
+    # info loads credentials (exiting with a message if that fails); the
+    # server then serves from the same cached session
     print_info()
 
     from server import run_http
@@ -7,14 +7,22 @@ import os
 # Add parent directory to path so we can import server
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from server import gemini_search
+def print_usage():
+    print("Usage: python search.py <query> [model]")
+    print("Example: python search.py 'What is the latest news on AI?'")
+    print("Example: python search.py 'What is Bitcoin price?' gemini-2.5-pro")
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python search.py <query> [model]")
-        print("Example: python search.py 'What is the latest news on AI?'")
-        print("Example: python search.py 'What is Bitcoin price?' gemini-2.5-pro")
+        print_usage()
         sys.exit(1)
+    if sys.argv[1] in ("-h", "--help"):
+        print_usage()
+        sys.exit(0)
+
+    # Imported only once we know a search will run: server pulls in
+    # fastmcp, google-auth and the HTTP clients.
+    from server import gemini_search
     
     query = sys.argv[1]
     model = sys.argv[2] if len(sys.argv) > 2 else "gemini-2.5-flash"
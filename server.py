@@ -1,20 +1,175 @@
 #!/usr/bin/env python3
 """MCP Server for Gemini Code Assist."""
 
+import asyncio
+import email.utils
 import json
 import os
+import random
+import stat
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 
-import requests
+import httpx
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from fastmcp import FastMCP
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the stdlib encoder/decoder
+    orjson = None
+
+# JSON helpers shared with info.py; json_dumps always returns bytes.
+if orjson is not None:
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+else:
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
 
 # Constants
 ENDPOINT = "https://cloudcode-pa.googleapis.com/v1internal"
 
-# Initialize MCP server
-mcp = FastMCP("gemini-code-assist")
+# Headers sent with every Code Assist request, on top of Authorization.
+# Accept-Encoding is left to httpx: it advertises gzip/deflate, plus br when
+# brotli is installed, and decodes compressed responses transparently.
+_GOOGLE_API_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "google-api-nodejs-client/9.15.1",
+    "X-Goog-Api-Client": "gl-node/22.17.0",
+    "Client-Metadata": "ideType=IDE_UNSPECIFIED,platform=PLATFORM_UNSPECIFIED,pluginType=GEMINI",
+}
+
+# Client metadata body expected by loadCodeAssist / onboardUser
+CODE_ASSIST_METADATA = {
+    "metadata": {
+        "ideType": "IDE_UNSPECIFIED",
+        "platform": "PLATFORM_UNSPECIFIED",
+        "pluginType": "GEMINI",
+    }
+}
+# Pre-encoded once; loadCodeAssist sends exactly this body (here and in info.py)
+CODE_ASSIST_METADATA_BODY = json_dumps(CODE_ASSIST_METADATA)
+
+
+# Transient statuses worth retrying; httpx itself only retries failed connection attempts.
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Longest Retry-After worth waiting for; beyond it (e.g. a per-minute quota)
+# retrying would only spend more quota on the same error.
+_MAX_RETRY_AFTER_SEC = 5.0
+
+
+def _retry_delay(response: httpx.Response, attempt: int, backoff_sec: float) -> float | None:
+    """Seconds to wait before retrying a transient response, or None to give up.
+
+    Honors Retry-After (delta-seconds or HTTP date), as urllib3's Retry does,
+    and falls back to exponential backoff when the header is absent or invalid.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return backoff_sec * (2 ** attempt)
+    try:
+        delay = float(retry_after)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return backoff_sec * (2 ** attempt)
+        delay = (_to_utc_aware(when) - datetime.now(timezone.utc)).total_seconds()
+    delay = max(delay, 0.0)
+    return delay if delay <= _MAX_RETRY_AFTER_SEC else None
+
+
+class _RetryTransport(httpx.HTTPTransport):
+    """HTTP/2 transport that also retries 429/5xx responses with a short backoff."""
+
+    def __init__(self, retries: int = 2, backoff_sec: float = 0.2, **kwargs) -> None:
+        super().__init__(retries=retries, **kwargs)
+        self._status_retries = retries
+        self._backoff_sec = backoff_sec
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self._status_retries + 1):
+            response = super().handle_request(request)
+            if response.status_code not in _RETRY_STATUSES or attempt == self._status_retries:
+                return response
+            delay = _retry_delay(response, attempt, self._backoff_sec)
+            if delay is None:
+                return response
+            response.close()
+            time.sleep(delay)
+        return response
+
+
+class _AsyncRetryTransport(httpx.AsyncHTTPTransport):
+    """Async counterpart of _RetryTransport, used by the MCP tool's clients."""
+
+    def __init__(self, retries: int = 2, backoff_sec: float = 0.2, **kwargs) -> None:
+        super().__init__(retries=retries, **kwargs)
+        self._status_retries = retries
+        self._backoff_sec = backoff_sec
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self._status_retries + 1):
+            response = await super().handle_async_request(request)
+            if response.status_code not in _RETRY_STATUSES or attempt == self._status_retries:
+                return response
+            delay = _retry_delay(response, attempt, self._backoff_sec)
+            if delay is None:
+                return response
+            await response.aclose()
+            await asyncio.sleep(delay)
+        return response
+
+
+# One client for every blocking Google API call: connections are reused and,
+# over HTTP/2, concurrent calls share a single TLS connection per host with
+# the repeated static headers compressed away by HPACK.
+HTTP_CLIENT = httpx.Client(
+    headers=_GOOGLE_API_HEADERS,
+    timeout=httpx.Timeout(60.0),
+    transport=_RetryTransport(http2=True, limits=httpx.Limits(max_connections=16, max_keepalive_connections=4)),
+)
+
+# Long-lived AsyncClient for the MCP server's event loop, opened and closed by
+# its lifespan (see _async_client_lifespan). Pooled connections belong to the
+# loop that opened them, so callers outside the server use a scoped client.
+_ASYNC_CLIENT: httpx.AsyncClient | None = None
+
+# MCP server, created on first use (see get_mcp)
+_MCP = None
+_GOOGLE_SEARCH_TOOL = None
+
+# credentials.json path resolved from CREDENTIALS_PATH (see get_credentials_path)
+_CREDS_PATH: str | None = None
+
+# Process-wide credentials cache (see _current_creds)
+_CREDS_LOCK = threading.Lock()
+_CREDS: Credentials | None = None
+_CREDS_DATA: dict = {}
+_CREDS_SOURCE: str | None = None
+# (st_mtime_ns, st_size) of credentials.json when it was last read or written
+_CREDS_FILE_KEY: tuple[int, int] | None = None
+# google-auth transport reused across token refreshes (one requests.Session)
+_AUTH_REQUEST: Request | None = None
+
+# Managed project ID resolved for the cached credentials (see get_managed_project)
+_PROJECT_ID: str | None = None
+# Serializes project resolution so concurrent cold-start calls onboard only once
+_PROJECT_LOCK = threading.Lock()
+
+if sys.version_info >= (3, 11):
+    _fromisoformat = datetime.fromisoformat
+else:
+    def _fromisoformat(value: str) -> datetime:
+        # Before 3.11, fromisoformat rejects a trailing "Z"
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
 
 def _parse_iso_datetime(value: str) -> datetime | None:
     """Parse an ISO datetime string.
@@ -25,7 +180,7 @@ def _parse_iso_datetime(value: str) -> datetime | None:
     if not isinstance(value, str) or not value:
         return None
     try:
-        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return _fromisoformat(value)
     except ValueError:
         return None
 
@@ -48,49 +203,98 @@ def _to_utc_aware(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
+def _reset_creds_path_cache() -> None:
+    """Forget the resolved CREDENTIALS_PATH (for tests that change it)."""
+    global _CREDS_PATH
+    _CREDS_PATH = None
+
+
 def get_credentials_path() -> str:
     """Get the path to credentials.json.
-    """
-    creds_dir = (os.environ.get("CREDENTIALS_PATH") or "").strip()
-    if not creds_dir:
-        creds_dir = os.path.dirname(os.path.abspath(__file__))
-    creds_dir = os.path.expanduser(creds_dir)
-    if creds_dir.lower().endswith(".json"):
-        raise ValueError(f"CREDENTIALS_PATH must be a directory, not a file path: {creds_dir}")
-    return os.path.join(creds_dir, "credentials.json")
 
+    CREDENTIALS_PATH is resolved and joined with "credentials.json" once per
+    process; later calls return the cached path.
+    """
+    global _CREDS_PATH
+
+    if _CREDS_PATH is None:
+        creds_dir = (os.environ.get("CREDENTIALS_PATH") or "").strip()
+        if not creds_dir:
+            creds_dir = os.path.dirname(os.path.abspath(__file__))
+        creds_dir = os.path.expanduser(creds_dir)
+        if creds_dir.lower().endswith(".json"):
+            raise ValueError(f"CREDENTIALS_PATH must be a directory, not a file path: {creds_dir}")
+        _CREDS_PATH = os.path.join(creds_dir, "credentials.json")
+    return _CREDS_PATH
+
+
+def _legacy_expiry(creds_data: dict) -> datetime | None:
+    """Derive an expiry from "obtained_at" + "expires_in" (older credentials files)."""
+    obtained_at_raw = creds_data.get("obtained_at")
+    expires_in_raw = creds_data.get("expires_in")
+    if not (isinstance(obtained_at_raw, str) and obtained_at_raw and expires_in_raw is not None):
+        return None
+    obtained_at = _parse_iso_datetime(obtained_at_raw)
+    if obtained_at is None:
+        return None
+    try:
+        expires_in = float(expires_in_raw)
+    except (ValueError, TypeError):
+        return None
+    return _to_utc_aware(obtained_at) + timedelta(seconds=expires_in)
 
-def get_session() -> str:
-    """Load credentials, refresh if needed, and return the access token."""
-    creds_path = get_credentials_path()
-
-    if not os.path.isfile(creds_path):
-        raise FileNotFoundError(
-            f"credentials.json not found at {creds_path}. Please run manual_auth.py first to authenticate."
-        )
 
-    with open(creds_path, "r") as f:
-        creds_data = json.load(f)
+def _credentials_expiry(creds_data: dict) -> datetime | None:
+    """Return the token expiry (UTC naive) stored in a credentials.json dict.
 
-    expiry: datetime | None = None
+    Freshness itself is left to google-auth (Credentials.valid/expired); this
+    only translates the stored timestamp into the naive UTC form it expects.
+    """
+    expiry = None
     expiry_raw = creds_data.get("expiry")
     if isinstance(expiry_raw, str) and expiry_raw:
-        parsed = _parse_iso_datetime(expiry_raw)
-        if parsed is not None:
-            expiry = _to_utc_naive(parsed)
-    else:
-        obtained_at_raw = creds_data.get("obtained_at")
-        expires_in_raw = creds_data.get("expires_in")
-        if isinstance(obtained_at_raw, str) and obtained_at_raw and expires_in_raw is not None:
-            try:
-                obtained_at = _parse_iso_datetime(obtained_at_raw)
-                if obtained_at is None:
-                    raise ValueError("Invalid obtained_at")
-                obtained_at_aware = _to_utc_aware(obtained_at)
-                expires_in = float(expires_in_raw)
-                expiry = _to_utc_naive(obtained_at_aware + timedelta(seconds=expires_in))
-            except (ValueError, TypeError):
-                expiry = None
+        expiry = _parse_iso_datetime(expiry_raw)
+    if expiry is None:
+        expiry = _legacy_expiry(creds_data)
+    return _to_utc_naive(expiry) if expiry is not None else None
+
+
+def credentials_expiry_utc(creds_data: dict) -> datetime | None:
+    """Return the token expiry stored in a credentials.json dict as an aware UTC datetime."""
+    expiry = _credentials_expiry(creds_data)
+    return expiry.replace(tzinfo=timezone.utc) if expiry is not None else None
+
+
+def _missing_credentials_error(creds_path: str) -> FileNotFoundError:
+    """Build the error raised when credentials.json doesn't exist yet."""
+    return FileNotFoundError(
+        f"credentials.json not found at {creds_path}. Please run manual_auth.py first to authenticate."
+    )
+
+
+def _creds_file_key(creds_path: str) -> tuple[int, int]:
+    """Return (st_mtime_ns, st_size) for credentials.json, used to spot changes on disk."""
+    try:
+        st = os.stat(creds_path)
+    except FileNotFoundError:
+        raise _missing_credentials_error(creds_path) from None
+    return st.st_mtime_ns, st.st_size
+
+
+def _load_creds_from_disk(creds_path: str) -> tuple[Credentials, dict]:
+    """Read credentials.json and build a google-auth Credentials object.
+
+    Returns the Credentials together with the raw dict so refreshed tokens can
+    be written back without dropping fields this module doesn't know about.
+    The file is parsed once here; Credentials.from_authorized_user_file can't
+    be used because it expects "token" rather than "access_token" and rejects
+    offset-aware expiry strings.
+    """
+    try:
+        with open(creds_path, "rb") as f:
+            creds_data = json_loads(f.read())
+    except FileNotFoundError:
+        raise _missing_credentials_error(creds_path) from None
 
     scopes = None
     scope_raw = creds_data.get("scope")
@@ -104,22 +308,93 @@ def get_session() -> str:
         client_id=creds_data.get("client_id"),
         client_secret=creds_data.get("client_secret"),
         scopes=scopes,
-        expiry=expiry,
+        expiry=_credentials_expiry(creds_data),
     )
+    return creds, creds_data
+
+
+def _write_creds_data(creds_path: str, creds_data: dict) -> tuple[int, int]:
+    """Atomically write the credentials dict back to credentials.json.
+
+    The data goes to a sibling temp file first and is then renamed over the
+    original, so a crash mid-write never leaves a truncated credentials file.
+    The temp file is private from the start and takes over the original's
+    permissions, since the file holds the refresh token and client secret.
+    Returns the new file key (see _creds_file_key).
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(creds_path).st_mode)
+    except FileNotFoundError:
+        mode = 0o600
+    tmp_path = creds_path + ".tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_dumps(creds_data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, creds_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return _creds_file_key(creds_path)
+
+
+def _persist_creds(creds_path: str, creds: Credentials, creds_data: dict) -> tuple[int, int]:
+    """Write a refreshed access token (and its expiry) back to credentials.json."""
+    creds_data["access_token"] = creds.token
+    if creds.expiry is not None:
+        now = datetime.now(timezone.utc)
+        creds_data["obtained_at"] = now.isoformat()
+        creds_data["expiry"] = _to_utc_aware(creds.expiry).isoformat()
+    return _write_creds_data(creds_path, creds_data)
+
+
+def _current_creds() -> Credentials:
+    """Return the cached Credentials, (re)loading and refreshing as needed.
+
+    credentials.json is read once per process and only re-read when its
+    mtime or size changes (e.g. after manual_auth.py runs again); otherwise
+    the cached Credentials object decides freshness and the file is only
+    rewritten when a refresh rotates the token. Callers must hold _CREDS_LOCK.
+    """
+    global _CREDS, _CREDS_DATA, _CREDS_SOURCE, _CREDS_FILE_KEY, _PROJECT_ID, _AUTH_REQUEST
+
+    creds_path = get_credentials_path()
+    file_key = _creds_file_key(creds_path)
+    if _CREDS is None or _CREDS_SOURCE != creds_path or _CREDS_FILE_KEY != file_key:
+        _CREDS, _CREDS_DATA = _load_creds_from_disk(creds_path)
+        _CREDS_SOURCE = creds_path
+        _CREDS_FILE_KEY = file_key
+        # A different account may own a different managed project
+        _PROJECT_ID = _CREDS_DATA.get("cloudaicompanionProject") or None
+    creds = _CREDS
 
     # Refresh if expired (or if expiry is missing, refresh once to learn it)
-    if (creds.expired or creds.expiry is None) and creds.refresh_token:
-        creds.refresh(Request())
-        # Save refreshed credentials
-        creds_data["access_token"] = creds.token
-        if creds.expiry is not None:
-            now = datetime.now(timezone.utc)
-            creds_data["obtained_at"] = now.isoformat()
-            creds_data["expiry"] = _to_utc_aware(creds.expiry).isoformat()
-        with open(creds_path, "w") as f:
-            json.dump(creds_data, f, indent=2)
+    if (not creds.valid or creds.expiry is None) and creds.refresh_token:
+        previous_token = creds.token
+        if _AUTH_REQUEST is None:
+            _AUTH_REQUEST = Request()
+        creds.refresh(_AUTH_REQUEST)
+        if creds.token != previous_token:
+            _CREDS_FILE_KEY = _persist_creds(creds_path, creds, _CREDS_DATA)
+    return creds
 
-    return creds.token
+
+def get_session_with_data() -> tuple[str, dict]:
+    """Return a valid access token plus a copy of the credentials.json data."""
+    with _CREDS_LOCK:
+        return _current_creds().token, dict(_CREDS_DATA)
+
+
+def get_session() -> str:
+    """Load credentials, refresh if needed, and return the access token."""
+    with _CREDS_LOCK:
+        return _current_creds().token
 
 
 def get_default_tier_id(allowed_tiers: list) -> str:
@@ -132,31 +407,20 @@ def get_default_tier_id(allowed_tiers: list) -> str:
     return allowed_tiers[0].get("id", "free-tier") if allowed_tiers else "free-tier"
 
 
-def onboard_managed_project(access_token: str, tier_id: str, attempts: int = 10, delay_sec: float = 5.0) -> str:
-    """Onboard user and get the managed project ID."""
-    import time
-    
-    url = "https://cloudcode-pa.googleapis.com/v1internal:onboardUser"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "User-Agent": "google-api-nodejs-client/9.15.1",
-        "X-Goog-Api-Client": "gl-node/22.17.0",
-        "Client-Metadata": "ideType=IDE_UNSPECIFIED,platform=PLATFORM_UNSPECIFIED,pluginType=GEMINI",
-    }
-    payload = {
-        "tierId": tier_id,
-        "metadata": {
-            "ideType": "IDE_UNSPECIFIED",
-            "platform": "PLATFORM_UNSPECIFIED",
-            "pluginType": "GEMINI",
-        }
-    }
+def onboard_managed_project(access_token: str, tier_id: str, attempts: int = 10, max_delay_sec: float = 5.0) -> str:
+    """Onboard user and get the managed project ID.
+
+    Polls with exponential backoff (0.5s, 1s, 2s, ... capped at max_delay_sec)
+    plus a little jitter, since onboarding usually completes within seconds.
+    """
+    url = f"{ENDPOINT}:onboardUser"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    payload = {**CODE_ASSIST_METADATA, "tierId": tier_id}
     
     for attempt in range(attempts):
-        response = requests.post(url, headers=headers, json=payload)
+        response = HTTP_CLIENT.post(url, headers=headers, content=json_dumps(payload))
         response.raise_for_status()
-        data = response.json()
+        data = json_loads(response.content)
         
         if data.get("done"):
             project_id = data.get("response", {}).get("cloudaicompanionProject", {}).get("id", "")
@@ -164,31 +428,60 @@ def onboard_managed_project(access_token: str, tier_id: str, attempts: int = 10,
                 return project_id
         
         if attempt < attempts - 1:
-            time.sleep(delay_sec)
+            time.sleep(min(max_delay_sec, 0.5 * (2 ** attempt)) + random.uniform(0, 0.25))
     
     return ""
 
 
 def get_managed_project(access_token: str) -> str:
+    """Return the managed project ID, resolving it only on first use.
+
+    The project is fixed for a given account, so the result of
+    _resolve_managed_project is kept for the lifetime of the process and
+    recorded in credentials.json so later cold starts skip the lookup.
+    """
+    global _PROJECT_ID
+
+    project_id = _PROJECT_ID
+    if project_id:
+        return project_id
+    with _PROJECT_LOCK:
+        # Another caller may have resolved it while we waited for the lock
+        if _PROJECT_ID:
+            return _PROJECT_ID
+        project_id = _resolve_managed_project(access_token)
+        if project_id:
+            _PROJECT_ID = project_id
+            _save_managed_project(project_id)
+    return project_id
+
+
+def _save_managed_project(project_id: str) -> None:
+    """Record the managed project in credentials.json (best effort)."""
+    global _CREDS_FILE_KEY
+
+    with _CREDS_LOCK:
+        if _CREDS_SOURCE is None or _CREDS_DATA.get("cloudaicompanionProject") == project_id:
+            return
+        try:
+            # credentials.json may have been rewritten while the project was being
+            # resolved (e.g. manual_auth.py ran again); never clobber newer tokens
+            if _creds_file_key(_CREDS_SOURCE) != _CREDS_FILE_KEY:
+                return
+            _CREDS_DATA["cloudaicompanionProject"] = project_id
+            _CREDS_FILE_KEY = _write_creds_data(_CREDS_SOURCE, _CREDS_DATA)
+        except OSError:
+            # The in-memory cache still works; only cold starts lose the shortcut
+            pass
+
+
+def _resolve_managed_project(access_token: str) -> str:
     """Call loadCodeAssist to get the managed project ID, onboarding if necessary."""
-    url = "https://cloudcode-pa.googleapis.com/v1internal:loadCodeAssist"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "User-Agent": "google-api-nodejs-client/9.15.1",
-        "X-Goog-Api-Client": "gl-node/22.17.0",
-        "Client-Metadata": "ideType=IDE_UNSPECIFIED,platform=PLATFORM_UNSPECIFIED,pluginType=GEMINI",
-    }
-    payload = {
-        "metadata": {
-            "ideType": "IDE_UNSPECIFIED",
-            "platform": "PLATFORM_UNSPECIFIED",
-            "pluginType": "GEMINI",
-        }
-    }
-    response = requests.post(url, headers=headers, json=payload)
+    url = f"{ENDPOINT}:loadCodeAssist"
+    headers = {"Authorization": f"Bearer {access_token}"}
+    response = HTTP_CLIENT.post(url, headers=headers, content=CODE_ASSIST_METADATA_BODY)
     response.raise_for_status()
-    data = response.json()
+    data = json_loads(response.content)
     
     # If we already have a managed project, return it
     if data.get("cloudaicompanionProject"):
@@ -201,28 +494,33 @@ def get_managed_project(access_token: str) -> str:
     return onboard_managed_project(access_token, tier_id)
 
 
-def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
-    """
-    Search using Gemini with Google Search grounding.
+def _new_async_client() -> httpx.AsyncClient:
+    """Build an AsyncClient for Code Assist calls; HTTP/2 multiplexes concurrent requests."""
+    return httpx.AsyncClient(
+        headers=_GOOGLE_API_HEADERS,
+        timeout=httpx.Timeout(60.0),
+        transport=_AsyncRetryTransport(
+            http2=True, limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+        ),
+    )
 
-    Args:
-        query: The search query or question to ask Gemini.
-        model: The model to use (default: gemini-2.5-flash).
 
-    Returns:
-        The answer from Gemini along with source URLs.
-    """
-    try:
-        # Step 1: Get the access token
-        access_token = get_session()
-    except FileNotFoundError as e:
-        return str(e)
+@asynccontextmanager
+async def _async_client_lifespan(server):
+    """FastMCP lifespan: share one AsyncClient across tool calls while the server runs."""
+    global _ASYNC_CLIENT
+
+    async with _new_async_client() as client:
+        _ASYNC_CLIENT = client
+        try:
+            yield {}
+        finally:
+            _ASYNC_CLIENT = None
 
-    # Step 2: Get managed project ID
-    project_id = get_managed_project(access_token)
 
-    # Step 3: Construct the payload
-    payload = {
+def _search_payload(query: str, model: str, project_id: str) -> dict:
+    """Build the generateContent payload for a grounded search."""
+    return {
         "project": project_id,
         "model": model,
         "request": {
@@ -231,31 +529,9 @@ def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
         },
     }
 
-    # Step 4: Send POST request
-    url = f"{ENDPOINT}:generateContent"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "User-Agent": "google-api-nodejs-client/9.15.1",
-        "X-Goog-Api-Client": "gl-node/22.17.0",
-        "Client-Metadata": "ideType=IDE_UNSPECIFIED,platform=PLATFORM_UNSPECIFIED,pluginType=GEMINI",
-    }
-
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        # Handle both HTTP errors and connection errors
-        if hasattr(e, "response") and e.response is not None:
-            return f"HTTP Error {e.response.status_code}: {e.response.text}"
-        return f"Request failed: {e}"
-
-    # Step 5: Parse Response
-    try:
-        data = response.json()
-    except json.JSONDecodeError:
-        return f"Failed to parse response as JSON: {response.text}"
 
+def _format_search_result(data: dict) -> str:
+    """Render a generateContent response as markdown with sources and citations."""
     # The response might be wrapped
     if "response" in data:
         data = data["response"]
@@ -274,6 +550,7 @@ def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
 
     # Extract grounding metadata (sources, supports, and search queries)
     sources = []
+    chunk_refs: list[str] = []
     grounding_supports = []
     web_search_queries = []
     
@@ -290,6 +567,8 @@ def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
                 title = web.get("title", "")
                 if uri:
                     sources.append({"index": i + 1, "title": title, "uri": uri})
+            # Citation labels per chunk (0-based index, displayed 1-based)
+            chunk_refs = [f"[{i + 1}]" for i in range(len(grounding_chunks))]
             
             # Extract grounding supports (citation mapping)
             # Structure: {"segment": {"startIndex": 0, "endIndex": 50}, 
@@ -301,25 +580,26 @@ def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
     except (KeyError, IndexError):
         pass
 
-    # Step 6: Format and return result
-    result = f"## Answer\n\n{answer}"
+    # Format and return result (collect pieces, join once at the end)
+    out: list[str] = [f"## Answer\n\n{answer}"]
     
     # Format sources with numbered references
     if sources:
-        result += "\n\n## Sources\n\n"
+        out.append("\n\n## Sources\n\n")
         for source in sources:
             title = source["title"] or "Untitled"
-            result += f"[{source['index']}] {title} - {source['uri']}\n"
+            out.append(f"[{source['index']}] {title} - {source['uri']}\n")
     
     # Format search queries used
     if web_search_queries:
-        result += "\n## Search Queries Used\n\n"
+        out.append("\n## Search Queries Used\n\n")
         for query in web_search_queries:
-            result += f"- {query}\n"
+            out.append(f"- {query}\n")
     
     # Format citation map (only if groundingSupports exists)
     if grounding_supports and answer:
-        result += "\n## Citation Map\n\n"
+        out.append("\n## Citation Map\n\n")
+        pct = "{:.0f}%".format
         for support in grounding_supports:
             segment = support.get("segment", {})
             start_idx = segment.get("startIndex", 0)
@@ -334,34 +614,182 @@ def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
                 if len(text_segment) > 100:
                     text_segment = text_segment[:97] + "..."
                 
-                # Format source references (indices are 0-based, display as 1-based)
-                source_refs = ", ".join(f"[{idx + 1}]" for idx in chunk_indices)
+                # Format source references, ignoring indices with no matching chunk
+                source_refs = ", ".join(chunk_refs[idx] for idx in chunk_indices if 0 <= idx < len(chunk_refs))
+                if not source_refs:
+                    continue
                 
                 # Format confidence scores as percentages
                 if confidence_scores:
-                    conf_strs = [f"{score * 100:.0f}%" for score in confidence_scores]
+                    conf_strs = [pct(score * 100) for score in confidence_scores]
                     confidence_str = f" (confidence: {', '.join(conf_strs)})"
                 else:
                     confidence_str = ""
                 
-                result += f'"{text_segment}" → Sources {source_refs}{confidence_str}\n\n'
+                out.append(f'"{text_segment}" → Sources {source_refs}{confidence_str}\n\n')
+
+    return "".join(out)
+
+
+def _search_result(response: httpx.Response, retry_stale_project: bool) -> str | None:
+    """Turn a generateContent response into the tool's result text.
+
+    Shared by gemini_search and gemini_search_async. Returns None when the
+    caller should retry: the cached project was rejected with 401/403 and has
+    been dropped, so the next attempt resolves it again.
+    """
+    global _PROJECT_ID
+
+    if not response.is_success:
+        if retry_stale_project and response.status_code in (401, 403):
+            _PROJECT_ID = None
+            return None
+        return f"HTTP Error {response.status_code}: {response.text}"
+    try:
+        data = json_loads(response.content)
+    except json.JSONDecodeError:
+        return f"Failed to parse response as JSON: {response.text}"
+    return _format_search_result(data)
+
+
+def gemini_search(query: str, model: str = "gemini-2.5-flash") -> str:
+    """
+    Search using Gemini with Google Search grounding (blocking).
+
+    Args:
+        query: The search query or question to ask Gemini.
+        model: The model to use (default: gemini-2.5-flash).
+
+    Returns:
+        The answer from Gemini along with source URLs.
+    """
+    try:
+        # Step 1: Get the access token
+        access_token = get_session()
+    except FileNotFoundError as e:
+        return str(e)
+
+    url = f"{ENDPOINT}:generateContent"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # A cached project that is no longer usable shows up as 401/403;
+    # in that case resolve it again and retry once.
+    retry_stale_project = _PROJECT_ID is not None
+    while True:
+        # Step 2: Get managed project ID
+        project_id = get_managed_project(access_token)
+
+        # Step 3: Send POST request
+        try:
+            response = HTTP_CLIENT.post(
+                url, headers=headers, content=json_dumps(_search_payload(query, model, project_id))
+            )
+        except httpx.HTTPError as e:
+            return f"Request failed: {e}"
+
+        # Step 4: Parse and format the response
+        result = _search_result(response, retry_stale_project)
+        if result is not None:
+            return result
+        retry_stale_project = False
+
+
+async def _gemini_search_with(client: httpx.AsyncClient, query: str, model: str) -> str:
+    """gemini_search_async's implementation, sending the request through client."""
+    try:
+        # Step 1: Get the access token (a refresh is a blocking google-auth call)
+        access_token = await asyncio.to_thread(get_session)
+    except FileNotFoundError as e:
+        return str(e)
+
+    url = f"{ENDPOINT}:generateContent"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Same stale-project handling as gemini_search
+    retry_stale_project = _PROJECT_ID is not None
+    while True:
+        # Step 2: Get managed project ID
+        project_id = await asyncio.to_thread(get_managed_project, access_token)
+
+        # Step 3: Send POST request without blocking the event loop
+        try:
+            response = await client.post(
+                url, headers=headers, content=json_dumps(_search_payload(query, model, project_id))
+            )
+        except httpx.HTTPError as e:
+            return f"Request failed: {e}"
+
+        # Step 4: Parse and format the response
+        result = _search_result(response, retry_stale_project)
+        if result is not None:
+            return result
+        retry_stale_project = False
+
+
+async def gemini_search_async(query: str, model: str = "gemini-2.5-flash") -> str:
+    """
+    Search using Gemini with Google Search grounding.
+
+    Args:
+        query: The search query or question to ask Gemini.
+        model: The model to use (default: gemini-2.5-flash).
+
+    Returns:
+        The answer from Gemini along with source URLs.
+    """
+    # Inside the MCP server, reuse its client; otherwise don't leave a pool
+    # behind on an event loop that may be about to close.
+    if _ASYNC_CLIENT is not None:
+        return await _gemini_search_with(_ASYNC_CLIENT, query, model)
+    async with _new_async_client() as client:
+        return await _gemini_search_with(client, query, model)
+
+
+async def gemini_search_batch(queries: list[str], model: str = "gemini-2.5-flash") -> list[str]:
+    """Run several searches concurrently; results are in the same order as queries."""
+    async with _new_async_client() as client:
+        return list(await asyncio.gather(*(_gemini_search_with(client, query, model) for query in queries)))
+
+
+def get_mcp():
+    """Return the FastMCP server, creating it and registering its tool on first use.
+
+    fastmcp is by far the heaviest import in this module, so code that only
+    needs credentials or gemini_search (CLI scripts, tests) never loads it.
+    """
+    global _MCP, _GOOGLE_SEARCH_TOOL
+
+    if _MCP is None:
+        from fastmcp import FastMCP
+
+        mcp = FastMCP("gemini-code-assist", lifespan=_async_client_lifespan)
+        # Register the callable as an MCP tool without replacing the function object.
+        # (Using `@mcp.tool()` would wrap the function and make it non-callable in tests.)
+        _GOOGLE_SEARCH_TOOL = mcp.tool(gemini_search_async, name="google_search")
+        _MCP = mcp
+    return _MCP
 
-    return result
 
+def __getattr__(name: str):
+    # Keep `server.mcp` / `server.google_search_tool` available (e.g. for
+    # `fastmcp run server.py`) without importing fastmcp at module load.
+    if name == "mcp":
+        return get_mcp()
+    if name == "google_search_tool":
+        get_mcp()
+        return _GOOGLE_SEARCH_TOOL
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Register the callable as an MCP tool without replacing the function object.
-# (Using `@mcp.tool()` would wrap the function and make it non-callable in tests.)
-google_search_tool = mcp.tool(gemini_search, name="google_search")
 
 def run_http(host: str = "0.0.0.0", port: int = 8080) -> None:
     """Run the MCP server in HTTP/SSE mode."""
-    mcp.run(transport="sse", host=host, port=port)
+    get_mcp().run(transport="sse", host=host, port=port)
 
 
 if __name__ == "__main__":
     transport = os.environ.get("MCP_TRANSPORT", "sse").strip().lower()
     if transport == "stdio":
-        mcp.run()
+        get_mcp().run()
     else:
         run_http(
             host=os.environ.get("HOST", "0.0.0.0"),
@@ -1,44 +1,119 @@
-import json
 import os
-import tempfile
-import unittest
-
-
-class TestCredentialsDatetime(unittest.TestCase):
-    def test_get_session_accepts_offset_aware_expiry_string(self) -> None:
-        # This regression test ensures we don't crash with:
-        # "can't compare offset-naive and offset-aware datetimes"
-        # when credentials.json stores an ISO timestamp with a timezone offset.
-        with tempfile.TemporaryDirectory() as tmpdir:
-            creds_path = os.path.join(tmpdir, "credentials.json")
-            with open(creds_path, "w") as f:
-                json.dump(
-                    {
-                        "access_token": "test-access-token",
-                        "refresh_token": None,
-                        "client_id": "test-client-id",
-                        "client_secret": "test-client-secret",
-                        "scope": "openid email",
-                        "expiry": "2099-01-01T00:00:00+00:00",
-                    },
-                    f,
-                )
-
-            prev = os.environ.get("CREDENTIALS_PATH")
-            os.environ["CREDENTIALS_PATH"] = tmpdir
-            try:
-                from server import get_session
-
-                token = get_session()
-            finally:
-                if prev is None:
-                    os.environ.pop("CREDENTIALS_PATH", None)
-                else:
-                    os.environ["CREDENTIALS_PATH"] = prev
-
-        self.assertEqual(token, "test-access-token")
-
-
-if __name__ == "__main__":
-    unittest.main()
+import stat
+from datetime import datetime, timezone
 
+import pytest
+from google.oauth2.credentials import Credentials
+
+from server import (
+    _credentials_expiry,
+    _parse_iso_datetime,
+    _reset_creds_path_cache,
+    credentials_expiry_utc,
+    get_session,
+    json_dumps,
+    json_loads,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_creds_path_cache():
+    # Each test points CREDENTIALS_PATH at its own location
+    _reset_creds_path_cache()
+    yield
+    _reset_creds_path_cache()
+
+
+@pytest.fixture(scope="module")
+def offset_aware_credentials() -> bytes:
+    """Serialized credentials.json whose expiry carries a "+00:00" offset."""
+    return json_dumps(
+        {
+            "access_token": "test-access-token",
+            "refresh_token": None,
+            "client_id": "test-client-id",
+            "client_secret": "test-client-secret",
+            "scope": "openid email",
+            "expiry": "2099-01-01T00:00:00+00:00",
+        }
+    )
+
+
+def test_get_session_accepts_offset_aware_expiry_string(
+    monkeypatch: pytest.MonkeyPatch, creds_dir, offset_aware_credentials: bytes
+) -> None:
+    # This regression test ensures we don't crash with:
+    # "can't compare offset-naive and offset-aware datetimes"
+    # when credentials.json stores an ISO timestamp with a timezone offset.
+    (creds_dir / "credentials.json").write_bytes(offset_aware_credentials)
+    monkeypatch.setenv("CREDENTIALS_PATH", str(creds_dir))
+
+    assert get_session() == "test-access-token"
+
+
+def test_get_session_rereads_credentials_when_file_changes(monkeypatch: pytest.MonkeyPatch, creds_dir) -> None:
+    creds_path = creds_dir / "credentials.json"
+
+    def write_token(token: str, mtime_ns: int) -> None:
+        creds_path.write_bytes(json_dumps({"access_token": token, "expiry": "2099-01-01T00:00:00+00:00"}))
+        os.utime(creds_path, ns=(mtime_ns, mtime_ns))
+
+    write_token("first-token", 1_000_000_000)
+
+    monkeypatch.setenv("CREDENTIALS_PATH", str(creds_dir))
+
+    first = get_session()
+    write_token("second-token", 2_000_000_000)
+    second = get_session()
+
+    assert first == "first-token"
+    assert second == "second-token"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file permissions")
+def test_refreshed_token_is_persisted_without_loosening_permissions(
+    monkeypatch: pytest.MonkeyPatch, tmp_path
+) -> None:
+    creds_path = tmp_path / "credentials.json"
+    creds_path.write_bytes(
+        json_dumps({"access_token": "old-token", "refresh_token": "refresh", "expiry": "2000-01-01T00:00:00Z"})
+    )
+    creds_path.chmod(0o600)
+
+    def fake_refresh(self, request) -> None:
+        self.token = "new-token"
+        self.expiry = datetime(2099, 1, 1)
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    monkeypatch.setenv("CREDENTIALS_PATH", str(tmp_path))
+
+    assert get_session() == "new-token"
+    assert json_loads(creds_path.read_bytes())["access_token"] == "new-token"
+    assert stat.S_IMODE(creds_path.stat().st_mode) == 0o600
+
+
+def test_expiry_falls_back_to_obtained_at_plus_expires_in() -> None:
+    legacy = {"obtained_at": "2099-01-01T00:00:00Z", "expires_in": 3600}
+    expected = datetime(2099, 1, 1, 1, 0, 0)
+
+    assert _credentials_expiry(legacy) == expected
+    assert _credentials_expiry({**legacy, "expiry": "not-a-date"}) == expected
+    assert _credentials_expiry({**legacy, "expiry": "2099-06-01T02:00:00+02:00"}) == datetime(2099, 6, 1)
+    assert _credentials_expiry({}) is None
+    assert credentials_expiry_utc(legacy) == expected.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2099-01-01T00:00:00+00:00",  # written by older versions / manual edits
+        "2099-01-01T00:00:00.123456+00:00",  # datetime.isoformat() with microseconds, as we write it
+        "2099-01-01T00:00:00Z",
+        "2099-01-01T02:00:00+02:00",
+    ],
+)
+def test_parse_iso_datetime_handles_stored_expiry_shapes(value: str) -> None:
+    parsed = _parse_iso_datetime(value)
+
+    assert parsed is not None
+    assert parsed.astimezone(timezone.utc).replace(microsecond=0) == datetime(2099, 1, 1, tzinfo=timezone.utc)
@@ -0,0 +1,71 @@
+from server import _format_search_result
+
+
+def test_renders_answer_sources_queries_and_citations() -> None:
+    answer = "Python 3.13 was released in October 2024. It adds a free-threaded build."
+    data = {
+        "response": {
+            "candidates": [
+                {
+                    "content": {"parts": [{"text": answer}]},
+                    "groundingMetadata": {
+                        "groundingChunks": [
+                            {"web": {"uri": "https://a.example", "title": "A"}},
+                            {"web": {"uri": "https://b.example", "title": ""}},
+                            {"web": {}},
+                        ],
+                        "groundingSupports": [
+                            {
+                                "segment": {"startIndex": 0, "endIndex": 41},
+                                "groundingChunkIndices": [0, 1],
+                                "confidenceScores": [0.91, 0.5],
+                            },
+                            {"segment": {"startIndex": 42, "endIndex": 73}, "groundingChunkIndices": [1]},
+                            {"segment": {"startIndex": 0, "endIndex": 0}, "groundingChunkIndices": [0]},
+                        ],
+                        "webSearchQueries": ["python 3.13 release"],
+                    },
+                }
+            ]
+        }
+    }
+
+    assert _format_search_result(data) == (
+        "## Answer\n\n"
+        f"{answer}\n\n"
+        "## Sources\n\n"
+        "[1] A - https://a.example\n"
+        "[2] Untitled - https://b.example\n"
+        "\n## Search Queries Used\n\n"
+        "- python 3.13 release\n"
+        "\n## Citation Map\n\n"
+        '"Python 3.13 was released in October 2024." → Sources [1], [2] (confidence: 91%, 50%)\n\n'
+        '"It adds a free-threaded build." → Sources [2]\n\n'
+    )
+
+
+def test_citations_skip_unknown_chunk_indices() -> None:
+    data = {
+        "candidates": [
+            {
+                "content": {"parts": [{"text": "First. Second."}]},
+                "groundingMetadata": {
+                    "groundingChunks": [{"web": {"uri": "https://a.example", "title": "A"}}],
+                    "groundingSupports": [
+                        {"segment": {"startIndex": 0, "endIndex": 6}, "groundingChunkIndices": [0, 5]},
+                        {"segment": {"startIndex": 7, "endIndex": 14}, "groundingChunkIndices": [3]},
+                    ],
+                },
+            }
+        ]
+    }
+
+    result = _format_search_result(data)
+
+    assert '"First." → Sources [1]\n\n' in result
+    assert 'Second." →' not in result
+
+
+def test_answer_only() -> None:
+    data = {"candidates": [{"content": {"parts": [{"text": "hi"}]}}]}
+    assert _format_search_result(data) == "## Answer\n\nhi"
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import httpx
+import pytest
+
+import server
+
+
+def _response(status_code: int, body: dict) -> httpx.Response:
+    return httpx.Response(status_code, json=body, request=httpx.Request("POST", server.ENDPOINT))
+
+
+@pytest.fixture(autouse=True)
+def empty_caches(monkeypatch: pytest.MonkeyPatch):
+    # Start every test without cached credentials or project
+    monkeypatch.setattr(server, "_PROJECT_ID", None)
+    monkeypatch.setattr(server, "_CREDS", None)
+    monkeypatch.setattr(server, "_CREDS_DATA", {})
+    monkeypatch.setattr(server, "_CREDS_SOURCE", None)
+    monkeypatch.setattr(server, "_CREDS_FILE_KEY", None)
+    server._reset_creds_path_cache()
+    yield
+    server._reset_creds_path_cache()
+
+
+def test_project_is_resolved_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    post = mock.Mock(return_value=_response(200, {"cloudaicompanionProject": "proj-1"}))
+    monkeypatch.setattr(server.HTTP_CLIENT, "post", post)
+
+    assert server.get_managed_project("token") == "proj-1"
+    assert server.get_managed_project("token") == "proj-1"
+    assert post.call_count == 1
+
+
+def test_concurrent_cold_start_resolves_project_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    def slow_resolve(access_token: str) -> str:
+        calls.append(access_token)
+        time.sleep(0.05)
+        return "proj-1"
+
+    monkeypatch.setattr(server, "_resolve_managed_project", slow_resolve)
+    monkeypatch.setattr(server, "_save_managed_project", lambda project_id: None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(server.get_managed_project("token"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["proj-1"] * 5
+    assert len(calls) == 1
+
+
+def test_stale_project_is_resolved_again_on_403(monkeypatch: pytest.MonkeyPatch) -> None:
+    server._PROJECT_ID = "stale-proj"
+    post = mock.Mock(
+        side_effect=[
+            _response(403, {"error": "permission denied"}),
+            _response(200, {"cloudaicompanionProject": "fresh-proj"}),
+            _response(200, {"candidates": [{"content": {"parts": [{"text": "hi"}]}}]}),
+        ]
+    )
+    monkeypatch.setattr(server, "get_session", lambda: "token")
+    monkeypatch.setattr(server.HTTP_CLIENT, "post", post)
+
+    result = server.gemini_search("hello")
+
+    assert "hi" in result
+    assert server._PROJECT_ID == "fresh-proj"
+    assert json.loads(post.call_args_list[-1].kwargs["content"])["project"] == "fresh-proj"
+
+
+def test_async_search_resolves_stale_project_on_403(monkeypatch: pytest.MonkeyPatch) -> None:
+    server._PROJECT_ID = "stale-proj"
+    post = mock.AsyncMock(
+        side_effect=[
+            _response(403, {"error": "permission denied"}),
+            _response(200, {"candidates": [{"content": {"parts": [{"text": "hi"}]}}]}),
+        ]
+    )
+    monkeypatch.setattr(server, "get_session", lambda: "token")
+    monkeypatch.setattr(server, "_resolve_managed_project", lambda access_token: "fresh-proj")
+    monkeypatch.setattr(server, "_save_managed_project", lambda project_id: None)
+    client = httpx.AsyncClient()
+    monkeypatch.setattr(client, "post", post)
+    monkeypatch.setattr(server, "_new_async_client", lambda: client)
+
+    result = asyncio.run(server.gemini_search_async("hello"))
+
+    assert "hi" in result
+    assert json.loads(post.call_args_list[-1].kwargs["content"])["project"] == "fresh-proj"
+
+
+def test_resolved_project_is_reused_from_credentials_file(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    creds_path = tmp_path / "credentials.json"
+    creds_path.write_text(json.dumps({"access_token": "token", "expiry": "2099-01-01T00:00:00+00:00"}))
+    monkeypatch.setenv("CREDENTIALS_PATH", str(tmp_path))
+
+    server.get_session()
+    monkeypatch.setattr(
+        server.HTTP_CLIENT, "post", mock.Mock(return_value=_response(200, {"cloudaicompanionProject": "proj-1"}))
+    )
+    server.get_managed_project("token")
+
+    assert json.loads(creds_path.read_text())["cloudaicompanionProject"] == "proj-1"
+
+    # A cold start picks the project up from disk without calling the API
+    server._CREDS = None
+    server._PROJECT_ID = None
+    server.get_session()
+    post = mock.Mock()
+    monkeypatch.setattr(server.HTTP_CLIENT, "post", post)
+
+    assert server.get_managed_project("token") == "proj-1"
+    post.assert_not_called()
+
+
+def test_project_is_not_saved_over_a_rewritten_credentials_file(monkeypatch: pytest.MonkeyPatch, tmp_path) -> None:
+    creds_path = tmp_path / "credentials.json"
+    creds_path.write_text(json.dumps({"access_token": "old-token", "expiry": "2099-01-01T00:00:00+00:00"}))
+    os.utime(creds_path, ns=(1_000_000_000, 1_000_000_000))
+    monkeypatch.setenv("CREDENTIALS_PATH", str(tmp_path))
+    server.get_session()
+
+    # manual_auth.py rewrites credentials.json while the project is being resolved
+    def resolve(access_token: str) -> str:
+        creds_path.write_text(json.dumps({"access_token": "new-token", "expiry": "2099-01-01T00:00:00+00:00"}))
+        os.utime(creds_path, ns=(2_000_000_000, 2_000_000_000))
+        return "proj-1"
+
+    monkeypatch.setattr(server, "_resolve_managed_project", resolve)
+    server.get_managed_project("old-token")
+
+    assert json.loads(creds_path.read_text()) == {"access_token": "new-token", "expiry": "2099-01-01T00:00:00+00:00"}
@@ -0,0 +1,80 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+
+
+def _fake_statuses(*statuses: int | tuple[int, dict]):
+    remaining = list(statuses)
+    seen = []
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url)
+        status = remaining.pop(0)
+        status, headers = status if isinstance(status, tuple) else (status, {})
+        return httpx.Response(status, headers=headers, request=request)
+
+    return respond, seen
+
+
+def test_retry_transport_retries_transient_statuses(monkeypatch: pytest.MonkeyPatch) -> None:
+    respond, seen = _fake_statuses(503, 429, 200)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, request: respond(request))
+
+    with httpx.Client(transport=server._RetryTransport(backoff_sec=0)) as client:
+        response = client.get("https://example.invalid/")
+
+    assert response.status_code == 200
+    assert len(seen) == 3
+
+
+def test_retry_transport_gives_up_after_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    respond, seen = _fake_statuses(503, 503, 503, 200)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, request: respond(request))
+
+    with httpx.Client(transport=server._RetryTransport(retries=2, backoff_sec=0)) as client:
+        response = client.get("https://example.invalid/")
+
+    assert response.status_code == 503
+    assert len(seen) == 3
+
+
+@pytest.mark.parametrize(
+    ("retry_after", "attempts", "sleeps"),
+    [
+        ("1", 2, [1.0]),  # short waits are honored instead of the default backoff
+        ("60", 1, []),  # a per-minute quota is returned straight away
+    ],
+)
+def test_retry_transport_honors_retry_after(
+    monkeypatch: pytest.MonkeyPatch, retry_after: str, attempts: int, sleeps: list[float]
+) -> None:
+    respond, seen = _fake_statuses((429, {"Retry-After": retry_after}), 200)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, request: respond(request))
+    slept = []
+    monkeypatch.setattr(server.time, "sleep", slept.append)
+
+    with httpx.Client(transport=server._RetryTransport()) as client:
+        response = client.get("https://example.invalid/")
+
+    assert response.status_code == (200 if attempts == 2 else 429)
+    assert len(seen) == attempts
+    assert slept == sleeps
+
+
+def test_async_retry_transport_retries_transient_statuses(monkeypatch: pytest.MonkeyPatch) -> None:
+    respond, seen = _fake_statuses(502, 200)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return respond(request)
+
+    monkeypatch.setattr(httpx.AsyncHTTPTransport, "handle_async_request", handle_async_request)
+
+    async def fetch() -> httpx.Response:
+        async with httpx.AsyncClient(transport=server._AsyncRetryTransport(backoff_sec=0)) as client:
+            return await client.get("https://example.invalid/")
+
+    assert asyncio.run(fetch()).status_code == 200
+    assert len(seen) == 2
@@ -1,12 +1,115 @@
 #!/usr/bin/env python3
-"""Test script for gemini_search function."""
+"""Tests for gemini_search, the function behind search.py and the MCP tool."""
 
-from server import gemini_search
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-def main() -> None:
-    result = gemini_search("Hello, are you working?", model="gemini-2.5-flash")
-    print(result)
+import httpx
+import pytest
 
+import server
 
-if __name__ == "__main__":
-    main()
+
+@pytest.mark.parametrize("model", ["gemini-2.5-flash"])
+def test_gemini_search(monkeypatch: pytest.MonkeyPatch, model: str) -> None:
+    # Stub credentials, project lookup and the HTTP call so no network is used
+    sent = []
+
+    def fake_post(url: str, **kwargs) -> httpx.Response:
+        sent.append(json.loads(kwargs["content"]))
+        body = {"response": {"candidates": [{"content": {"parts": [{"text": "Yes, I am working."}]}}]}}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(server, "get_session", lambda: "test-token")
+    monkeypatch.setattr(server, "get_managed_project", lambda access_token: "test-project")
+    monkeypatch.setattr(server.HTTP_CLIENT, "post", fake_post)
+
+    result = server.gemini_search("Hello, are you working?", model=model)
+
+    assert result == "## Answer\n\nYes, I am working."
+    assert sent[0]["model"] == model
+    assert sent[0]["project"] == "test-project"
+
+
+def test_gemini_search_batch(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def fake_post(url: str, **kwargs) -> httpx.Response:
+        query = json.loads(kwargs["content"])["request"]["contents"][0]["parts"][0]["text"]
+        body = {"response": {"candidates": [{"content": {"parts": [{"text": f"echo: {query}"}]}}]}}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", url))
+
+    monkeypatch.setattr(server, "get_session", lambda: "test-token")
+    monkeypatch.setattr(server, "get_managed_project", lambda access_token: "test-project")
+    client = httpx.AsyncClient()
+    monkeypatch.setattr(client, "post", fake_post)
+    monkeypatch.setattr(server, "_new_async_client", lambda: client)
+
+    results = asyncio.run(server.gemini_search_batch(["one", "two"]))
+
+    assert results == ["## Answer\n\necho: one", "## Answer\n\necho: two"]
+
+
+def test_gemini_search_batch_leaves_nothing_behind_between_event_loops(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Real keep-alive connections: a client pooled on one asyncio.run loop
+    # must be closed with it, not reused (or leaked) by the next one.
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = json.dumps({"candidates": [{"content": {"parts": [{"text": "ok"}]}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    monkeypatch.setattr(server, "ENDPOINT", f"http://127.0.0.1:{httpd.server_address[1]}/v1internal")
+    monkeypatch.setattr(server, "get_session", lambda: "test-token")
+    monkeypatch.setattr(server, "get_managed_project", lambda access_token: "test-project")
+    clients = []
+    new_async_client = server._new_async_client
+
+    def tracked_async_client() -> httpx.AsyncClient:
+        clients.append(new_async_client())
+        return clients[-1]
+
+    monkeypatch.setattr(server, "_new_async_client", tracked_async_client)
+
+    try:
+        for _ in range(2):
+            assert asyncio.run(server.gemini_search_batch(["a", "b"])) == ["## Answer\n\nok"] * 2
+            assert asyncio.run(server.gemini_search_async("c")) == "## Answer\n\nok"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+    assert len(clients) == 4
+    assert all(client.is_closed for client in clients)
+    assert server._ASYNC_CLIENT is None
+
+
+def test_mcp_lifespan_shares_and_closes_one_client() -> None:
+    async def run() -> httpx.AsyncClient:
+        async with server._async_client_lifespan(None):
+            client = server._ASYNC_CLIENT
+            assert client is not None and not client.is_closed
+        return client
+
+    assert asyncio.run(run()).is_closed
+    assert server._ASYNC_CLIENT is None
+
+
+@pytest.mark.skipif(not os.environ.get("RUN_LIVE_GEMINI"), reason="live API call; set RUN_LIVE_GEMINI=1")
+def test_gemini_search_live() -> None:
+    # Smoke test against the real API (needs credentials.json); the prompts run concurrently
+    prompts = ["Hello, are you working?", "What is the capital of France?"]
+    results = asyncio.run(server.gemini_search_batch(prompts, model="gemini-2.5-flash"))
+    assert all(result.startswith("## Answer\n\n") for result in results)